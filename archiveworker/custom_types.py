@@ -14,9 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
+import re
 from enum import StrEnum
-from typing import List
 
 
 class WorkerThreadInterrupter:
@@ -74,9 +73,51 @@ class JobArchiveRequest:
     Deserialized JSON request for creating an archive job
     """
 
+    __slots__ = (
+        'api_version',
+        'moodle_base_url',
+        'moodle_ws_url',
+        'moodle_upload_url',
+        'wstoken',
+        'courseid',
+        'cmid',
+        'quizid',
+        'archive_filename',
+        'tasks',
+    )
+
     API_VERSION = 6
 
-    PAPER_FORMATS = ['A0', 'A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'Letter', 'Legal', 'Tabloid', 'Ledger']
+    PAPER_FORMATS = frozenset(['A0', 'A1', 'A2', 'A3', 'A4', 'A5', 'A6', 'Letter', 'Legal', 'Tabloid', 'Ledger'])
+
+    ARCHIVE_FILENAME_RE = re.compile(r'[^\0\\/:*?"<>|.]+')
+
+    # Validation rules as (attribute / key, type, additional check or None)
+    VALIDATION_RULES = (
+        ('moodle_base_url', str, None),
+        ('moodle_ws_url', str, None),
+        ('moodle_upload_url', str, None),
+        ('wstoken', str, None),
+        ('courseid', int, lambda v: v >= 0),
+        ('cmid', int, lambda v: v >= 0),
+        ('quizid', int, lambda v: v >= 0),
+        ('archive_filename', str, lambda v: JobArchiveRequest.ARCHIVE_FILENAME_RE.fullmatch(v) is not None),
+    )
+
+    TASK_ARCHIVE_QUIZ_ATTEMPTS_VALIDATION_RULES = (
+        ('attemptids', list, None),
+        ('sections', dict, None),
+        ('fetch_metadata', bool, None),
+        ('paper_format', str, lambda v: v in JobArchiveRequest.PAPER_FORMATS),
+        ('keep_html_files', bool, None),
+        ('filename_pattern', str, None),
+    )
+
+    IMAGE_OPTIMIZE_VALIDATION_RULES = (
+        ('width', int, lambda v: v >= 1),
+        ('height', int, lambda v: v >= 1),
+        ('quality', int, lambda v: 0 <= v <= 100),
+    )
 
     def __init__(self,
                  api_version: int,
@@ -118,77 +159,45 @@ class JobArchiveRequest:
         :param json: Deserialized request JSON
         :return: JobArchiveRequest object
         """
-        # Catch API version missmatch early
-        if 'api_version' not in json:
-            raise ValueError('API version missing in request payload')
-        if not isinstance(json['api_version'], int):
-            raise ValueError('API version must be an integer')
-        if json['api_version'] != JobArchiveRequest.API_VERSION:
-            raise ValueError(f'API version mismatch. Expected: {JobArchiveRequest.API_VERSION}, Got: {json["api_version"]}. Please update your quiz-archive-worker!')
+        # Catch API version missmatch early. Only inspect details on failure.
+        api_version = json.get('api_version')
+        if type(api_version) is not int or api_version != JobArchiveRequest.API_VERSION:
+            if api_version is None:
+                raise ValueError('API version missing in request payload')
+            if not isinstance(api_version, int):
+                raise ValueError('API version must be an integer')
+            raise ValueError(f'API version mismatch. Expected: {JobArchiveRequest.API_VERSION}, Got: {api_version}. Please update your quiz-archive-worker!')
 
         return JobArchiveRequest(**json)
 
     def _validate_self(self):
         """Validates this object based on current values"""
-        if not isinstance(self.moodle_base_url, str) or self.moodle_base_url is None:
-            return False
-
-        if not isinstance(self.moodle_ws_url, str) or self.moodle_ws_url is None:
-            return False
-
-        if not isinstance(self.moodle_upload_url, str) or self.moodle_upload_url is None:
-            return False
-
-        if not isinstance(self.wstoken, str) or self.wstoken is None:
-            return False
-
-        if not isinstance(self.courseid, int) or self.courseid < 0:
-            return False
-
-        if not isinstance(self.cmid, int) or self.cmid < 0:
-            return False
-
-        if not isinstance(self.quizid, int) or self.quizid < 0:
-            return False
-
-        if not isinstance(self.archive_filename, str) or self.archive_filename is None:
-            return False
-        else:
-            # Do not allow paths
-            if not os.path.basename(self.archive_filename) == self.archive_filename:
+        for attr, valtype, check in self.VALIDATION_RULES:
+            value = getattr(self, attr)
+            if not isinstance(value, valtype) or (check and not check(value)):
                 return False
 
-            # Do not allow forbidden characters
-            if any(c in self.archive_filename for c in ["\0", "\\", "/", ":", "*", "?", "\"", "<", ">", "|", "."]):
-                return False
+        task_archive_quiz_attempts = self.tasks['archive_quiz_attempts']
+        if task_archive_quiz_attempts:
+            for key, valtype, check in self.TASK_ARCHIVE_QUIZ_ATTEMPTS_VALIDATION_RULES:
+                value = task_archive_quiz_attempts[key]
+                if not isinstance(value, valtype) or (check and not check(value)):
+                    return False
 
-        if self.tasks['archive_quiz_attempts']:
-            if not isinstance(self.tasks['archive_quiz_attempts']['attemptids'], List):
+            image_optimize = task_archive_quiz_attempts['image_optimize']
+            if not (image_optimize is False or isinstance(image_optimize, dict)):
                 return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['sections'], object):
-                return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['fetch_metadata'], bool):
-                return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['paper_format'], str) or self.tasks['archive_quiz_attempts']['paper_format'] not in self.PAPER_FORMATS:
-                return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['keep_html_files'], bool):
-                return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['filename_pattern'], str) or self.tasks['archive_quiz_attempts']['filename_pattern'] is None:
-                return False
-            if not isinstance(self.tasks['archive_quiz_attempts']['image_optimize'], object) and not self.tasks['archive_quiz_attempts']['image_optimize'] is False:
-                return False
-            if isinstance(self.tasks['archive_quiz_attempts']['image_optimize'], object) and self.tasks['archive_quiz_attempts']['image_optimize'] is not False:
-                if not isinstance(self.tasks['archive_quiz_attempts']['image_optimize']['width'], int) or self.tasks['archive_quiz_attempts']['image_optimize']['width'] < 1:
-                    return False
-                if not isinstance(self.tasks['archive_quiz_attempts']['image_optimize']['height'], int) or self.tasks['archive_quiz_attempts']['image_optimize']['height'] < 1:
-                    return False
-                if not isinstance(self.tasks['archive_quiz_attempts']['image_optimize']['quality'], int) or not 0 <= self.tasks['archive_quiz_attempts']['image_optimize']['quality'] <= 100:
-                    return False
+            if isinstance(image_optimize, dict):
+                for key, valtype, check in self.IMAGE_OPTIMIZE_VALIDATION_RULES:
+                    value = image_optimize[key]
+                    if not isinstance(value, valtype) or (check and not check(value)):
+                        return False
 
-        if self.tasks['archive_moodle_backups']:
-            if not isinstance(self.tasks['archive_moodle_backups'], List):
+        task_moodle_backups = self.tasks['archive_moodle_backups']
+        if task_moodle_backups:
+            if not isinstance(task_moodle_backups, list):
                 return False
-            for backup in self.tasks['archive_moodle_backups']:
+            for backup in task_moodle_backups:
                 for key in ['backupid', 'filename', 'file_download_url']:
                     if key not in backup:
                         return False
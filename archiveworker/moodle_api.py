@@ -15,35 +15,103 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import hashlib
-import json
 import logging
 import os
 import re
-from json import JSONDecodeError
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from typing import Dict, Tuple, List
+from urllib.parse import urlencode, quote_plus, urlparse
 from uuid import UUID
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
 
 from archiveworker.custom_types import JobStatus, BackupStatus
 from config import Config
 
+try:
+    from itertools import batched
+except ImportError:  # Python < 3.12
+    def batched(iterable, n):
+        """
+        Backport of itertools.batched, introduced in Python 3.12
+
+        :param iterable: Iterable to split into batches
+        :param n: Maximum number of elements per batch
+        :return: Generator yielding tuples of at most n elements
+        """
+        it = iter(iterable)
+        while batch := tuple(islice(it, n)):
+            yield batch
+
 
 class MoodleAPI:
     """
     Adapter for the Moodle Web Service API
     """
 
+    logger = logging.getLogger(__name__)
+    """Logger shared by all adapter instances"""
+
     MOODLE_UPLOAD_FILE_FIELDS = ['component', 'contextid', 'userid', 'filearea', 'filename', 'filepath', 'itemid']
     """Keys that are present in the response for each file, received after uploading a file to Moodle"""
 
+    ATTEMPTS_METADATA_REQUIRED_FIELDS = frozenset({'attempts', 'cmid', 'courseid', 'quizid'})
+    """Keys that must be present in the response of the attempts metadata webservice function"""
+
+    ATTEMPT_DATA_REQUIRED_FIELDS = frozenset({'attemptid', 'cmid', 'courseid', 'quizid', 'filename', 'report', 'attachments'})
+    """Keys that must be present in the response of the attempt data webservice function"""
+
+    WS_REST_URL_RE = re.compile(r'https?://.+/webservice/rest/server\.php')
+    """Precompiled regex a valid Moodle webservice REST URL must fully match"""
+
+    WS_UPLOAD_URL_RE = re.compile(r'https?://.+/webservice/upload\.php')
+    """Precompiled regex a valid Moodle webservice upload URL must fully match"""
+
     REQUEST_TIMEOUTS = (10, 60)
     """Tuple of connection and read timeouts for default requests to the Moodle API in seconds"""
 
     REQUEST_TIMEOUTS_EXTENDED = (10, 1800)
     """Tuple of connection and read timeouts for long-running requests to the Moodle API in seconds"""
 
+    ATTEMPTS_METADATA_BATCH_SIZE = 100
+    """Number of attempts to request metadata for in a single call, to avoid hitting the maximum URL length"""
+
+    ATTEMPTIDS_QUERY_KEY = quote_plus('attemptids[]')
+    """URL encoded name of the attempt IDs array query parameter"""
+
+    DOWNLOAD_ERROR_RESPONSE_MAX_BYTES = 10240  # 10 KiB
+    """Downloads smaller than this are checked for being a Moodle error response instead of the requested file"""
+
+    HTTP_POOL_MAXSIZE_MIN = 10
+    """Minimum number of connections to keep alive per Moodle host"""
+
+    HTTP_RETRIES = 3
+    """Number of times to retry read-only requests that failed due to gateway errors or read timeouts. Failed connection attempts are retried once for all requests."""
+
+    DOWNLOAD_CHUNK_SIZE = 1 << 22  # 4 MiB
+    """Number of bytes to read from the network and write to disk at once when downloading files from Moodle"""
+
+    HTTP_SESSIONS_MAX = 8
+    """Maximum number of Moodle hosts to keep HTTP sessions for. The least recently used idle sessions are closed first."""
+
+    _sessions: OrderedDict[Tuple[str, str], Tuple[requests.Session, requests.Session]] = OrderedDict()
+    """Pairs of default and read-only HTTP sessions shared between all adapter instances, keyed by URL scheme and Moodle host"""
+
+    _session_users: Dict[Tuple[str, str], weakref.WeakSet] = {}
+    """Adapter instances that currently use the shared HTTP sessions, keyed like _sessions"""
+
+    _sessions_lock = threading.Lock()
+    """Lock guarding _sessions and _session_users"""
+
     def __init__(self, ws_rest_url: str, ws_upload_url: str, wstoken: str):
         """
         Initialize the Moodle API adapter
@@ -52,15 +120,143 @@ class MoodleAPI:
         :param ws_upload_url: Full URL to the upload endpoint of the Moodle Web Service API
         :param wstoken: Web Service token to authenticate with at the Moodle API
         """
-        self.logger = logging.getLogger(f"{__name__}")
-
         self.ws_rest_url = ws_rest_url
         self.ws_upload_url = ws_upload_url
         self.wstoken = wstoken
         self.restformat = 'json'
+        self._sections_params_cache = (None, {})
+        self._created_dirs = set()
+
+        self._status_update_cond = threading.Condition()
+        self._status_update_pending = None
+        self._status_update_thread = None
 
         self._validate_properties()
 
+        self.session, self.readonly_session = self._get_sessions(self.ws_rest_url, self)
+        self._base_wsfunc_params = {
+            'wstoken': self.wstoken,
+            'moodlewsrestformat': self.restformat,
+        }
+        self._base_file_params = {
+            'token': self.wstoken,
+        }
+        self._download_params = self._generate_file_request_params(forcedownload=1)
+        self._update_job_status_params = self._generate_wsfunc_request_params(
+            wsfunction=Config.MOODLE_WSFUNCTION_UPDATE_JOB_STATUS
+        )
+        self._process_upload_params = self._generate_wsfunc_request_params(
+            wsfunction=Config.MOODLE_WSFUNCTION_PROESS_UPLOAD
+        )
+        self._get_backup_params = self._generate_wsfunc_request_params(
+            wsfunction=Config.MOODLE_WSFUNCTION_GET_BACKUP
+        )
+        self._attempt_data_params = self._generate_wsfunc_request_params(
+            wsfunction=Config.MOODLE_WSFUNCTION_ARCHIVE
+        )
+
+    @classmethod
+    def _get_sessions(cls, ws_rest_url: str, user: 'MoodleAPI') -> Tuple[requests.Session, requests.Session]:
+        """
+        Returns the HTTP sessions for the given Moodle host. Sessions are shared
+        between all adapter instances, so that connections can be reused across
+        the connection probe and all jobs for the same Moodle. The wstoken is
+        sent as a request parameter and therefore not part of the session.
+
+        Since adapters are created from unauthenticated archive requests, only
+        the HTTP_SESSIONS_MAX most recently used hosts are kept. Sessions are
+        only evicted once no adapter uses them anymore, so that running jobs
+        are never affected by other requests.
+
+        The default session never retries requests that possibly reached Moodle,
+        since many state-changing webservice functions are invoked via GET. The
+        read-only session additionally retries gateway errors and read timeouts.
+
+        :param ws_rest_url: Full URL to the REST endpoint of the Moodle Web Service API
+        :param user: Adapter instance that will use the returned sessions
+        :return: Tuple of shared default and read-only HTTP sessions
+        """
+        url = urlparse(ws_rest_url)
+        key = (url.scheme, url.netloc)
+        evicted = []
+        with cls._sessions_lock:
+            sessions = cls._sessions.get(key)
+            if sessions is None:
+                sessions = cls._sessions[key] = (
+                    cls._create_session(retry_reads=False),
+                    cls._create_session(retry_reads=True),
+                )
+                cls._session_users[key] = weakref.WeakSet()
+            else:
+                cls._sessions.move_to_end(key)
+            cls._session_users[key].add(user)
+
+            # Evict least recently used sessions that are idle
+            if len(cls._sessions) > cls.HTTP_SESSIONS_MAX:
+                for idle_key in [k for k in cls._sessions if not cls._session_users[k]]:
+                    evicted.extend(cls._sessions.pop(idle_key))
+                    del cls._session_users[idle_key]
+                    if len(cls._sessions) <= cls.HTTP_SESSIONS_MAX:
+                        break
+
+        for session in evicted:
+            session.close()
+
+        return sessions
+
+    @classmethod
+    def close_sessions(cls) -> None:
+        """
+        Closes all shared HTTP sessions and releases their pooled connections.
+        Adapters that are created afterwards will open new sessions.
+
+        :return: None
+        """
+        with cls._sessions_lock:
+            sessions = [session for pair in cls._sessions.values() for session in pair]
+            cls._sessions.clear()
+            cls._session_users.clear()
+
+        for session in sessions:
+            session.close()
+
+    @classmethod
+    def _create_session(cls, retry_reads: bool) -> requests.Session:
+        """
+        Creates a new HTTP session with a connection pool that is sized for all
+        concurrent attempt data requests plus background status updates of all
+        jobs that are processed in parallel, since they share a single session.
+        Failed connection attempts are always retried once.
+
+        :param retry_reads: If True, transient gateway errors and read timeouts
+                            are retried as well. Must only be used for requests
+                            that do not change any state within Moodle.
+        :return: New HTTP session
+        """
+        if retry_reads:
+            retry = Retry(
+                total=cls.HTTP_RETRIES,
+                connect=1,
+                backoff_factor=0.5,
+                status_forcelist=[502, 503, 504],
+                raise_on_status=False
+            )
+        else:
+            retry = Retry(total=cls.HTTP_RETRIES, connect=1, read=0, status=0)
+
+        session = requests.Session()
+        http_adapter = HTTPAdapter(
+            pool_maxsize=max(
+                cls.HTTP_POOL_MAXSIZE_MIN,
+                (Config.MOODLE_API_MAX_PARALLEL_REQUESTS + 2) * max(1, Config.WORKER_THREADS)
+            ),
+            max_retries=retry
+        )
+        session.mount('http://', http_adapter)
+        session.mount('https://', http_adapter)
+
+        return session
+
     def _validate_properties(self) -> None:
         """
         Validate the set properties of the adapter
@@ -70,13 +266,13 @@ class MoodleAPI:
         if not self.ws_rest_url:
             raise ValueError('Webservice REST base URL is required')
 
-        if not self.ws_rest_url.startswith('http') or not self.ws_rest_url.endswith('/webservice/rest/server.php'):
+        if not self.WS_REST_URL_RE.fullmatch(self.ws_rest_url):
             raise ValueError('Webservice REST base URL is invalid')
 
         if not self.ws_upload_url:
             raise ValueError("Webservice upload URL is required")
 
-        if not self.ws_upload_url.startswith('http') or not self.ws_upload_url.endswith('/webservice/upload.php'):
+        if not self.WS_UPLOAD_URL_RE.fullmatch(self.ws_upload_url):
             raise ValueError("Webservice upload URL is invalid")
 
         if not self.wstoken:
@@ -89,11 +285,24 @@ class MoodleAPI:
         :param kwargs: Additional parameters to include in the request
         :return: Dictionary with the request parameters
         """
-        return {
-            'wstoken': self.wstoken,
-            'moodlewsrestformat': self.restformat,
-            **kwargs
-        }
+        return self._base_wsfunc_params | kwargs
+
+    def _generate_sections_params(self, sections: dict) -> Dict[str, str]:
+        """
+        Generates the report section request parameters for the Moodle
+        webservice API. Sections are the same for all attempts of a job, so
+        the result for the most recently used sections dict is cached.
+
+        :param sections: Dict with section names as keys and boolean values that
+                         indicate whether the section should be included in the report
+        :return: Dictionary with the sections request parameters
+        """
+        cached_sections, cached_params = self._sections_params_cache
+        if sections is not cached_sections:
+            cached_params = {f'sections[{key}]': value for key, value in sections.items()}
+            self._sections_params_cache = (sections, cached_params)
+
+        return cached_params
 
     def _generate_file_request_params(self, **kwargs) -> Dict[str, str]:
         """
@@ -102,10 +311,22 @@ class MoodleAPI:
         :param kwargs: Additional parameters to include in the request
         :return:  Dictionary with the request parameters
         """
-        return {
-            'token': self.wstoken,
-            **kwargs
-        }
+        return self._base_file_params | kwargs
+
+    @staticmethod
+    def _strip_html_wrapper(response: bytes) -> memoryview:
+        """
+        Removes the "<html><body>" prefix and "</body></html>" suffix that
+        Moodle 4.3 seems to add to some webservice responses, which causes the
+        JSON parser to fail. The wrapper is sliced off via a memoryview to not
+        copy the potentially huge response payload.
+
+        :param response: Raw response body
+        :return: View on the response body without the HTML wrapper
+        """
+        start = len(b'<html><body>') if response.startswith(b'<html><body>') else 0
+        end = -len(b'</body></html>') if response.endswith(b'</body></html>') else None
+        return memoryview(response)[start:end]
 
     @staticmethod
     def generate_proxy_settings() -> Dict[str, str] | None:
@@ -135,14 +356,14 @@ class MoodleAPI:
         :raises ConnectionError: If the connection could not be established
         """
         try:
-            r = requests.get(
+            r = self.session.get(
                 url=self.ws_rest_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS,
-                params=self._generate_wsfunc_request_params(wsfunction=Config.MOODLE_WSFUNCTION_UPDATE_JOB_STATUS)
+                params=self._update_job_status_params
             )
 
-            data = r.json()
+            data = orjson.loads(r.content)
         except Exception as e:
             self.logger.warning(f'Moodle API connection check failed with exception: {str(e)}')
             return False
@@ -157,7 +378,72 @@ class MoodleAPI:
 
     def update_job_status(self, jobid: UUID, status: JobStatus, statusextras: Dict = None) -> bool:
         """
-        Update the status of a job via the Moodle API
+        Update the status of a job via the Moodle API. Pending status updates,
+        queued via enqueue_job_status_update(), are sent beforehand to preserve
+        the order of status updates.
+
+        :param jobid: UUID of the job to update
+        :param status: New status to set
+        :param statusextras: Additional status information to include
+        :return: True if the status was updated successfully, False otherwise
+        """
+        self.flush_job_status_updates()
+        return self._send_job_status_update(jobid, status, statusextras)
+
+    def enqueue_job_status_update(self, jobid: UUID, status: JobStatus, statusextras: Dict = None) -> None:
+        """
+        Queues a status update for a job that is sent to the Moodle API by a
+        background thread, without blocking the caller. If a previously queued
+        status update was not sent yet, it is replaced by the new one, since
+        only the latest status is relevant.
+
+        :param jobid: UUID of the job to update
+        :param status: New status to set
+        :param statusextras: Additional status information to include
+        :return: None
+        """
+        with self._status_update_cond:
+            self._status_update_pending = (jobid, status, statusextras)
+            if self._status_update_thread is None:
+                self._status_update_thread = threading.Thread(
+                    target=self._process_queued_job_status_updates,
+                    daemon=True,
+                    name=f'moodle_api_status_update_{jobid}'
+                )
+                self._status_update_thread.start()
+
+    def flush_job_status_updates(self) -> None:
+        """
+        Blocks until all status updates, queued via enqueue_job_status_update(),
+        were sent to the Moodle API
+
+        :return: None
+        """
+        with self._status_update_cond:
+            self._status_update_cond.wait_for(lambda: self._status_update_thread is None)
+
+    def _process_queued_job_status_updates(self) -> None:
+        """
+        Sends queued job status updates to the Moodle API until no more updates
+        are pending. Runs inside the background status update thread.
+
+        :return: None
+        """
+        while True:
+            with self._status_update_cond:
+                if self._status_update_pending is None:
+                    self._status_update_thread = None
+                    self._status_update_cond.notify_all()
+                    return
+
+                jobid, status, statusextras = self._status_update_pending
+                self._status_update_pending = None
+
+            self._send_job_status_update(jobid, status, statusextras)
+
+    def _send_job_status_update(self, jobid: UUID, status: JobStatus, statusextras: Dict = None) -> bool:
+        """
+        Performs the actual job status update request against the Moodle API
 
         :param jobid: UUID of the job to update
         :param status: New status to set
@@ -168,21 +454,20 @@ class MoodleAPI:
             # Prepare statusextras
             conditional_params = {}
             if statusextras:
-                conditional_params = {f'statusextras': json.dumps(statusextras)}
+                conditional_params = {'statusextras': orjson.dumps(statusextras).decode()}
 
             # Call wsfunction to update job status
-            r = requests.get(
+            r = self.session.get(
                 url=self.ws_rest_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS,
-                params=self._generate_wsfunc_request_params(
-                    wsfunction=Config.MOODLE_WSFUNCTION_UPDATE_JOB_STATUS,
-                    jobid=str(jobid),
-                    status=str(status),
+                params=self._update_job_status_params | {
+                    'jobid': str(jobid),
+                    'status': str(status),
                     **conditional_params
-                )
+                }
             )
-            data = r.json()
+            data = orjson.loads(r.content)
 
             if data['status'] == 'OK':
                 return True
@@ -206,33 +491,26 @@ class MoodleAPI:
         """
         try:
             self.logger.debug(f'Requesting status for backup {backupid}')
-            r = requests.get(
+            r = self.readonly_session.get(
                 url=self.ws_rest_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS,
-                params=self._generate_wsfunc_request_params(
-                    wsfunction=Config.MOODLE_WSFUNCTION_GET_BACKUP,
-                    jobid=str(jobid),
-                    backupid=str(backupid)
-                )
+                params=self._get_backup_params | {
+                    'jobid': str(jobid),
+                    'backupid': str(backupid),
+                }
             )
-            response = r.json()
+            response = orjson.loads(r.content)
         except Exception:
             raise ConnectionError(f'Failed to get status of backup {backupid} for job {jobid}')
 
         if 'errorcode' in response and 'debuginfo' in response:
             raise RuntimeError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_BACKUP} returned error "{response["errorcode"]}". Message: {response["debuginfo"]}')
 
-        if response['status'] == BackupStatus.PENDING:
-            return BackupStatus.PENDING
-
-        if response['status'] == BackupStatus.SUCCESS:
-            return BackupStatus.SUCCESS
-
-        if response['status'] == BackupStatus.FAILED:
-            return BackupStatus.FAILED
-
-        raise RuntimeError(f'Retrieving status of backup "{backupid}" failed with {response["status"]}. Aborting.')
+        try:
+            return BackupStatus(response['status'])
+        except ValueError:
+            raise RuntimeError(f'Retrieving status of backup "{backupid}" failed with {response["status"]}. Aborting.')
 
     def get_remote_file_metadata(self, download_url: str) -> Tuple[str, int]:
         """
@@ -244,11 +522,11 @@ class MoodleAPI:
         """
         try:
             self.logger.debug(f'Requesting HEAD for file {download_url}')
-            h = requests.head(
+            h = self.readonly_session.head(
                 url=download_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS,
-                params=self._generate_file_request_params(),
+                params=self._base_file_params,
                 allow_redirects=True
             )
             self.logger.debug(f'Download file HEAD request headers: {h.headers}')
@@ -283,52 +561,66 @@ class MoodleAPI:
         :raises RuntimeError: If the file download failed or the downloaded file
         was larger than the specified maximum size, an I/O error occurred, or
         the downloaded file did not match the given SHA1 sum
-        :raises ConnectionError: if the download failed for any other reason
+        :raises ConnectionError: if the download failed due to network issues
         """
         target_file = target_path.joinpath(target_filename)
 
         try:
-            os.makedirs(target_path, exist_ok=True)
-            with open(target_file, 'wb+') as f:
-                r = requests.get(
-                    url=download_url,
-                    proxies=self.generate_proxy_settings(),
-                    stream=True,
-                    timeout=self.REQUEST_TIMEOUTS_EXTENDED,
-                    params=self._generate_file_request_params(forcedownload=1)
-                )
-
-                chunksize = int(32 * 10e6)  # 32 MB
+            if target_path not in self._created_dirs:
+                os.makedirs(target_path, exist_ok=True)
+                self._created_dirs.add(target_path)
+            with open(target_file, 'wb+') as f, self.readonly_session.get(
+                url=download_url,
+                proxies=self.generate_proxy_settings(),
+                stream=True,
+                timeout=self.REQUEST_TIMEOUTS_EXTENDED,
+                params=self._download_params
+            ) as r:
+                # Abort early if the announced file size already exceeds the limit
+                content_length = r.headers.get('Content-Length', '')
+                if content_length.isdigit() and int(content_length) > maxsize_bytes:
+                    raise RuntimeError(f'Moodle file to download has a size of {content_length} bytes and exceeds the maximum file size limit of {maxsize_bytes} bytes')
+
+                # Reserve disk space for the whole file upfront, if the size is known
+                if content_length.isdigit() and hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, int(content_length))
+                    except OSError:
+                        pass  # Filesystem does not support preallocation
+
+                sha1sum = hashlib.sha1() if sha1sum_expected else None
                 downloaded_bytes = 0
-                for chunk in r.iter_content(chunksize):
-                    if downloaded_bytes > maxsize_bytes:
+                head = b''
+                for chunk in r.iter_content(self.DOWNLOAD_CHUNK_SIZE):
+                    # Check before writing to never store more than maxsize_bytes
+                    if downloaded_bytes + len(chunk) > maxsize_bytes:
                         raise RuntimeError(f'Downloaded Moodle file was larger than expected and exceeded the maximum file size limit of {maxsize_bytes} bytes')
+                    if sha1sum:
+                        sha1sum.update(chunk)
+                    if downloaded_bytes < self.DOWNLOAD_ERROR_RESPONSE_MAX_BYTES:
+                        head += chunk[:self.DOWNLOAD_ERROR_RESPONSE_MAX_BYTES - downloaded_bytes]
                     downloaded_bytes = downloaded_bytes + f.write(chunk)
-        except RuntimeError as e:
-            raise e
+
+                # Drop preallocated space that was not filled, e.g., due to a wrong Content-Length
+                f.truncate(downloaded_bytes)
+        except requests.RequestException as e:
+            # Must be handled before IOError, since RequestException inherits from it
+            raise ConnectionError(f'Failed to download Moodle file from: {download_url}. {str(e)}')
         except IOError:
             raise RuntimeError(f'Encountered internal IOError while writing a downloading Moodle file from {download_url} to {target_filename}')
-        except Exception:
-            ConnectionError(f'Failed to download Moodle file from: {download_url}')
 
         # Check if we downloaded a Moodle error message
-        if downloaded_bytes < 10240:  # 10 KiB
-            with open(target_file, 'r') as f:
-                try:
-                    data = json.load(f)
-                    if 'errorcode' in data and 'debuginfo' in data:
-                        self.logger.debug(f'Downloaded JSON response: {data}')
-                        raise RuntimeError(f'Moodle file download failed with "{data["errorcode"]}"')
-                except (JSONDecodeError, UnicodeDecodeError):
-                    pass
+        if downloaded_bytes < self.DOWNLOAD_ERROR_RESPONSE_MAX_BYTES and head.lstrip().startswith(b'{') and b'"errorcode"' in head:
+            try:
+                data = orjson.loads(head)
+                if 'errorcode' in data and 'debuginfo' in data:
+                    self.logger.debug(f'Downloaded JSON response: {data}')
+                    raise RuntimeError(f'Moodle file download failed with "{data["errorcode"]}"')
+            except orjson.JSONDecodeError:
+                pass
 
         # Check SHA1 sum
-        if sha1sum_expected:
-            with open(target_file, 'rb') as f:
-                sha1sum = hashlib.sha1()
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha1sum.update(byte_block)
-
+        if sha1sum:
             if sha1sum.hexdigest() != sha1sum_expected:
                 raise RuntimeError(f'Moodle file download failed. Expected SHA1 sum "{sha1sum_expected}" but got "{sha1sum.hexdigest()}"')
 
@@ -340,7 +632,8 @@ class MoodleAPI:
         Fetches metadata for all quiz attempts that should be archived
 
         Metadata is fetched in batches of 100 attempts to avoid hitting the
-        maximum URL length of the Moodle webservice API
+        maximum URL length of the Moodle webservice API. Up to
+        Config.MOODLE_API_MAX_PARALLEL_REQUESTS batches are requested in parallel.
 
         :return: list of dicts containing metadata for each quiz attempt
 
@@ -349,55 +642,75 @@ class MoodleAPI:
         :raises ValueError: if the response from the Moodle webservice API was
         incomplete or contained invalid data
         """
-        # Slice attemptids into batches
-        attemptids = attemptids
-        batchsize = 100
-        batches = [attemptids[i:i + batchsize] for i in range(0, len(attemptids), batchsize)]
-
-        # Fetch metadata for each batch
-        metadata = []
-        params = self._generate_wsfunc_request_params(
+        base_query = urlencode(self._generate_wsfunc_request_params(
             wsfunction=Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA,
             courseid=courseid,
             cmid=cmid,
             quizid=quizid
-        )
+        ))
 
-        for batch in batches:
-            try:
-                params['attemptids[]'] = batch
-                r = requests.get(
-                    url=self.ws_rest_url,
-                    proxies=self.generate_proxy_settings(),
-                    timeout=self.REQUEST_TIMEOUTS,
-                    params=params
-                )
-                data = r.json()
-            except Exception:
-                self.logger.debug(f'Call to Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} at "{self.ws_rest_url}')
-                raise ConnectionError(f'Call to Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} at "{self.ws_rest_url}" failed')
+        # Fetch metadata for all batches in parallel while preserving their order
+        metadata = []
+        executor = ThreadPoolExecutor(max_workers=max(1, Config.MOODLE_API_MAX_PARALLEL_REQUESTS))
+        try:
+            for batch_metadata in executor.map(
+                    lambda batch: self._get_attempts_metadata_batch(base_query, courseid, cmid, quizid, batch),
+                    batched(attemptids, self.ATTEMPTS_METADATA_BATCH_SIZE)
+            ):
+                metadata.extend(batch_metadata)
+                self.logger.debug(f"Fetched metadata for {len(metadata)} of {len(attemptids)} quiz attempts")
+        finally:
+            # Do not start any further requests if a batch failed
+            executor.shutdown(cancel_futures=True)
 
-            # Check if Moodle wsfunction returned an error
-            if 'errorcode' in data and 'debuginfo' in data:
-                raise RuntimeError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned error "{data["errorcode"]}". Message: {data["debuginfo"]}')
+        return metadata
 
-            # Check if response is as expected
-            for attr in ['attempts', 'cmid', 'courseid', 'quizid']:
-                if attr not in data:
-                    raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned an incomplete response')
+    def _get_attempts_metadata_batch(self, base_query: str, courseid: int, cmid: int, quizid: int, attemptids: Tuple[int, ...]) -> List[Dict[str, str]]:
+        """
+        Fetches metadata for a single batch of quiz attempts
 
-            if not (
-                data['courseid'] == courseid and
-                data['cmid'] == cmid and
-                data['quizid'] == quizid
-            ):
-                raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned an invalid response')
+        :param base_query: Encoded query string with all static request parameters
+        :param courseid: ID of the course the quiz is part of
+        :param cmid: ID of the course module that corresponds to the quiz
+        :param quizid: ID of the quiz
+        :param attemptids: IDs of the quiz attempts in this batch
+        :return: list of dicts containing metadata for each quiz attempt in this batch
 
-            # Data seems valid
-            metadata.extend(data['attempts'])
-            self.logger.debug(f"Fetched metadata for {len(metadata)} of {len(attemptids)} quiz attempts")
+        :raises ConnectionError: if the request to the Moodle webservice API failed
+        :raises RuntimeError: if the Moodle webservice API reported an error
+        :raises ValueError: if the response from the Moodle webservice API was
+        incomplete or contained invalid data
+        """
+        try:
+            # Attempt IDs are integers and therefore need no escaping
+            batch_query = '&'.join(f'{self.ATTEMPTIDS_QUERY_KEY}={int(attemptid)}' for attemptid in attemptids)
+            r = self.readonly_session.get(
+                url=f'{self.ws_rest_url}?{base_query}&{batch_query}',
+                proxies=self.generate_proxy_settings(),
+                timeout=self.REQUEST_TIMEOUTS
+            )
+            data = orjson.loads(r.content)
+        except Exception:
+            self.logger.debug(f'Call to Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} at "{self.ws_rest_url}')
+            raise ConnectionError(f'Call to Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} at "{self.ws_rest_url}" failed')
 
-        return metadata
+        # Check if Moodle wsfunction returned an error
+        if 'errorcode' in data and 'debuginfo' in data:
+            raise RuntimeError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned error "{data["errorcode"]}". Message: {data["debuginfo"]}')
+
+        # Check if response is as expected
+        if not isinstance(data, dict) or not self.ATTEMPTS_METADATA_REQUIRED_FIELDS <= data.keys():
+            raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned an incomplete response')
+
+        if not (
+            data['courseid'] == courseid and
+            data['cmid'] == cmid and
+            data['quizid'] == quizid
+        ):
+            raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_GET_ATTEMPTS_METADATA} returned an invalid response')
+
+        # Data seems valid
+        return data['attempts']
 
     def get_attempt_data(
             self,
@@ -431,26 +744,23 @@ class MoodleAPI:
                  report and a List of attachments for the requested attemptid
         """
         try:
-            r = requests.get(
+            r = self.readonly_session.get(
                 url=self.ws_rest_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS,
-                params=self._generate_wsfunc_request_params(
-                    wsfunction=Config.MOODLE_WSFUNCTION_ARCHIVE,
-                    courseid=courseid,
-                    cmid=cmid,
-                    quizid=quizid,
-                    attemptid=attemptid,
-                    filenamepattern=filenamepattern,
-                    attachments=attachments,
-                    **{f'sections[{key}]': value for key, value in sections.items()}
-                )
+                params=self._attempt_data_params | {
+                    'courseid': courseid,
+                    'cmid': cmid,
+                    'quizid': quizid,
+                    'attemptid': attemptid,
+                    'filenamepattern': filenamepattern,
+                    'attachments': attachments,
+                    **self._generate_sections_params(sections)
+                }
             )
 
-            # Moodle 4.3 seems to return an additional "</body></html>" at the end of the response which causes the JSON parser to fail
-            response = r.text.lstrip('<html><body>').rstrip('</body></html>')
-            data = json.loads(response)
-        except JSONDecodeError as e:
+            data = orjson.loads(self._strip_html_wrapper(r.content))
+        except orjson.JSONDecodeError:
             self.logger.debug(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_ARCHIVE} response: {r.text}')
             raise ValueError(f'Call to Moodle webservice function {Config.MOODLE_WSFUNCTION_ARCHIVE} at "{self.ws_rest_url}" returned invalid JSON')
         except Exception as e:
@@ -466,9 +776,8 @@ class MoodleAPI:
             raise RuntimeError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_ARCHIVE} returned error "{data["errorcode"]}".')
 
         # Check if response is as expected
-        for attr in ['attemptid', 'cmid', 'courseid', 'quizid', 'filename', 'report', 'attachments']:
-            if attr not in data:
-                raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_ARCHIVE} returned an incomplete response')
+        if not isinstance(data, dict) or not self.ATTEMPT_DATA_REQUIRED_FIELDS <= data.keys():
+            raise ValueError(f'Moodle webservice function {Config.MOODLE_WSFUNCTION_ARCHIVE} returned an incomplete response')
 
         if not (
                 data['attemptid'] == attemptid and
@@ -501,18 +810,22 @@ class MoodleAPI:
 
         with open(file, "rb") as f:
             try:
-                file_stats = os.stat(file)
-                filesize = file_stats.st_size
+                filesize = os.fstat(f.fileno()).st_size
                 self.logger.info(f'Uploading file "{file}" (size: {filesize} bytes) to "{self.ws_upload_url}"')
 
-                r = requests.post(
+                # Stream the multipart body instead of buffering the whole file in memory
+                encoder = MultipartEncoder(fields={
+                    **{key: str(value) for key, value in self._generate_file_request_params(filepath='/', itemid=0).items()},
+                    'file_1': (file.name, f, 'application/octet-stream'),
+                })
+                r = self.session.post(
                     url=self.ws_upload_url,
                     proxies=self.generate_proxy_settings(),
                     timeout=self.REQUEST_TIMEOUTS_EXTENDED,
-                    files={'file_1': f},
-                    data=self._generate_file_request_params(filepath='/', itemid=0)
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type}
                 )
-                response = r.json()
+                response = orjson.loads(r.content)
             except Exception as e:
                 raise ConnectionError(f'Failed to upload file to "{self.ws_upload_url}". Exception: {str(e)}. Response: {r.text}')
 
@@ -563,26 +876,25 @@ class MoodleAPI:
         """
         # Call wsfunction to process artifact
         try:
-            r = requests.get(
+            r = self.session.get(
                 url=self.ws_rest_url,
                 proxies=self.generate_proxy_settings(),
                 timeout=self.REQUEST_TIMEOUTS_EXTENDED,
-                params=self._generate_wsfunc_request_params(
-                    wsfunction=Config.MOODLE_WSFUNCTION_PROESS_UPLOAD,
-                    jobid=str(jobid),
-                    artifact_component=component,
-                    artifact_contextid=contextid,
-                    artifact_userid=userid,
-                    artifact_filearea=filearea,
-                    artifact_filename=filename,
-                    artifact_filepath=filepath,
-                    artifact_itemid=itemid,
-                    artifact_sha256sum=sha256sum,
-                )
+                params=self._process_upload_params | {
+                    'jobid': str(jobid),
+                    'artifact_component': component,
+                    'artifact_contextid': contextid,
+                    'artifact_userid': userid,
+                    'artifact_filearea': filearea,
+                    'artifact_filename': filename,
+                    'artifact_filepath': filepath,
+                    'artifact_itemid': itemid,
+                    'artifact_sha256sum': sha256sum,
+                }
             )
-            response = r.json()
-        except Exception:
-            ConnectionError(f'Failed to call upload processing hook "{Config.MOODLE_WSFUNCTION_PROESS_UPLOAD}" at "{self.ws_rest_url}"')
+            response = orjson.loads(r.content)
+        except (requests.RequestException, orjson.JSONDecodeError):
+            raise ConnectionError(f'Failed to call upload processing hook "{Config.MOODLE_WSFUNCTION_PROESS_UPLOAD}" at "{self.ws_rest_url}"')
 
         # Check if Moodle wsfunction returned an error
         if 'errorcode' in response and 'debuginfo' in response:
@@ -19,21 +19,49 @@ import os
 import queue
 import re
 import threading
+import time
 import uuid
 from http import HTTPStatus
 from collections import deque
 
+import orjson
 import waitress
 from flask import Flask, make_response, request, jsonify
+from flask.json.provider import JSONProvider
 
 from config import Config
 from .moodle_api import MoodleAPI
 from .quiz_archive_job import QuizArchiveJob
 from .custom_types import WorkerStatus, JobArchiveRequest, JobStatus, WorkerThreadInterrupter
 
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider that uses orjson for (de-)serialization. UUIDs and
+    enums, as they are used in job responses, are natively supported by orjson.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(orjson.dumps(self._prepare_response_obj(args, kwargs)), mimetype='application/json')
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 job_queue = queue.Queue(maxsize=Config.QUEUE_SIZE)
 job_history = deque(maxlen=Config.HISTORY_SIZE)
+job_index = {}
+job_history_lock = threading.Lock()
+proxy_url_regex = re.compile(r"^(?P<protocol>.+?)://((?P<username>.+?):(?P<password>.+?)@)?(?P<address>.+)$")
+
+# Responses of static endpoints never change during runtime
+index_response_body = orjson.dumps({'app': Config.APP_NAME, 'version': Config.VERSION})
+version_response_body = orjson.dumps({'version': Config.VERSION})
 
 
 class InterruptableThread(threading.Thread):
@@ -43,6 +71,7 @@ class InterruptableThread(threading.Thread):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._stop_event = threading.Event()
+        self.current_job = None
 
     def run(self):
         super().run()
@@ -54,64 +83,114 @@ class InterruptableThread(threading.Thread):
         return self._stop_event.is_set()
 
 
+def job_execution_loop(jobs: queue.Queue, results: queue.Queue) -> None:
+    """
+    Executes all jobs received via the given queue and reports the exception
+    raised by each job, or None on success. Terminates after receiving None.
+
+    :param jobs: Queue to receive jobs to execute from
+    :param results: Queue to put the outcome of each job into
+    :return: None
+    """
+    while (job := jobs.get()) is not None:
+        try:
+            job.execute()
+            results.put(None)
+        except Exception as e:
+            results.put(e)
+
+
 def queue_processing_loop():
     app.logger.info("Spawned queue worker thread")
 
-    while getattr(threading.current_thread(), "do_run", True):
-        # Start job execution
-        job = job_queue.get()
-        if isinstance(job, WorkerThreadInterrupter):
-            app.logger.info("Received interrupt signal. Terminating queue worker thread")
-            return
+    worker = threading.current_thread()
 
-        t = InterruptableThread(target=job.execute)
-        t.start()
-        t.join(Config.REQUEST_TIMEOUT_SEC)
+    # Jobs are executed on a single reused daemon thread instead of spawning a
+    # new one per job. Being a daemon, it never delays interpreter shutdown.
+    jobs = queue.Queue(maxsize=1)
+    results = queue.Queue()
+    threading.Thread(target=job_execution_loop, args=(jobs, results), daemon=True, name=worker.name.replace('queue_processing_thread', 'job_execution_thread')).start()
 
-        # Determine if job finished or timeout was reached
-        if t.is_alive():
-            t.stop()
-            app.logger.warning(f'Job {job.get_id()} exceeded runtime limit of {Config.REQUEST_TIMEOUT_SEC} seconds. Request termination ...')
-            t.join()
-            app.logger.info(f'Job {job.get_id()} terminated gracefully')
+    try:
+        while not worker.stop_requested():
+            # Start job execution
+            job = job_queue.get()
+            if isinstance(job, WorkerThreadInterrupter):
+                app.logger.info("Received interrupt signal. Terminating queue worker thread")
+                return
+
+            worker.current_job = job
+            jobs.put(job)
+            try:
+                error = results.get(timeout=Config.REQUEST_TIMEOUT_SEC)
+            except queue.Empty:
+                # Job did not finish in time
+                job.request_stop()
+                app.logger.warning(f'Job {job.get_id()} exceeded runtime limit of {Config.REQUEST_TIMEOUT_SEC} seconds. Request termination ...')
+                error = results.get()
+                app.logger.info(f'Job {job.get_id()} terminated gracefully')
+            finally:
+                worker.current_job = None
+
+            if error is not None:
+                app.logger.error(f'Job {job.get_id()} crashed with {type(error).__name__}: {str(error)}')
+    finally:
+        jobs.put(None)
 
     app.logger.info("Terminating queue worker thread")
 
 
+def add_job_to_history(job: QuizArchiveJob) -> None:
+    """
+    Appends a job to the job history and keeps the jobid index in sync. Jobs
+    that are evicted from the history are removed from the index as well.
+
+    :param job: Job to add to the history
+    :return: None
+    """
+    with job_history_lock:
+        if job_history.maxlen == 0:
+            return
+
+        if len(job_history) == job_history.maxlen:
+            job_index.pop(job_history[0].get_id(), None)
+        job_history.append(job)
+        job_index[job.get_id()] = job
+
+
 def error_response(error_msg: str, status_code):
     return make_response(jsonify({'error': error_msg}), status_code)
 
 
 @app.get('/')
 def handle_index():
-    return {
-        'app': Config.APP_NAME,
-        'version': Config.VERSION
-    }
+    return app.response_class(index_response_body, mimetype='application/json'), HTTPStatus.OK
 
 
 @app.get('/status')
 def handle_status():
-    if job_queue.empty():
+    queue_len = job_queue.qsize()
+    if queue_len == 0:
         status = WorkerStatus.IDLE
-    elif job_queue.qsize() < Config.QUEUE_SIZE:
+    elif Config.QUEUE_SIZE <= 0:
+        # Queue size is unbounded and can therefore never be full
+        status = WorkerStatus.UNKNOWN
+    elif queue_len < Config.QUEUE_SIZE:
         status = WorkerStatus.ACTIVE
-    elif job_queue.full():
-        status = WorkerStatus.BUSY
     else:
-        status = WorkerStatus.UNKNOWN
+        status = WorkerStatus.BUSY
 
     return jsonify({
         'status': status,
-        'queue_len': job_queue.qsize()
+        'queue_len': queue_len
     }), HTTPStatus.OK
 
 
 @app.get('/status/<string:jobid>')
 def handle_status_jobid(jobid):
     try:
-        job = job_history[job_history.index(jobid)]
-    except ValueError:
+        job = job_index[uuid.UUID(jobid)]
+    except (ValueError, KeyError):
         return error_response(f"Job with requested jobid '{jobid}' was not found", HTTPStatus.NOT_FOUND)
 
     return jsonify(job.to_json()), HTTPStatus.OK
@@ -119,19 +198,20 @@ def handle_status_jobid(jobid):
 
 @app.get('/version')
 def handle_version():
-    return jsonify({'version': Config.VERSION}), HTTPStatus.OK
+    return app.response_class(version_response_body, mimetype='application/json'), HTTPStatus.OK
 
 
 @app.post('/archive')
 def handle_archive_request():
-    app.logger.debug(f"Received new archive request: {request.data}")
+    request_data = request.get_data(cache=False)
+    app.logger.debug('Received new archive request: %s', request_data)
 
     job = None
     try:
         # Check arguments
         if not request.is_json:
             return error_response('Request must be JSON.', HTTPStatus.BAD_REQUEST)
-        job_request = JobArchiveRequest.from_json(request.get_json())
+        job_request = JobArchiveRequest.from_json(orjson.loads(request_data))
 
         # Check queue capacity early
         if job_queue.full():
@@ -143,9 +223,9 @@ def handle_archive_request():
             return error_response(f'Could not establish a connection to Moodle webservice API at "{job_request.moodle_ws_url}" using the provided wstoken.', HTTPStatus.BAD_REQUEST)
 
         # Enqueue request
-        job = QuizArchiveJob(uuid.uuid1(), job_request)
+        job = QuizArchiveJob(uuid.uuid4(), job_request)
         job_queue.put_nowait(job)  # Actual queue capacity limit is enforced here!
-        job_history.append(job)
+        add_job_to_history(job)
         job.set_status(JobStatus.AWAITING_PROCESSING, notify_moodle=False)
         app.logger.info(f"Enqueued job {job.get_id()} from {request.remote_addr}")
     except TypeError as e:
@@ -174,11 +254,43 @@ def handle_archive_request():
 
 def start_processing_thread() -> None:
     """
-    Starts the queue processing thread.
+    Starts the queue processing threads. Config.WORKER_THREADS threads are
+    spawned that all consume jobs from the shared job queue.
+    :return: None
+    """
+    for i in range(max(1, Config.WORKER_THREADS)):
+        queue_processing_thread = InterruptableThread(target=queue_processing_loop, daemon=True, name=f'queue_processing_thread_{i}')
+        queue_processing_thread.start()
+
+
+def stop_processing_threads(timeout: float = 30) -> None:
+    """
+    Requests all queue processing threads to terminate and waits for them to
+    finish. Jobs that are currently executed are requested to stop as well.
+    :param timeout: Maximum number of seconds to wait for all threads to terminate
     :return: None
     """
-    queue_processing_thread = InterruptableThread(target=queue_processing_loop, daemon=True, name='queue_processing_thread')
-    queue_processing_thread.start()
+    threads = [t for t in threading.enumerate() if isinstance(t, InterruptableThread)]
+
+    # Interrupts are enqueued for all threads first, since any of the queue
+    # workers can consume any of the interrupts. If the queue is full, workers
+    # notice their stop flag after their current job terminated.
+    for t in threads:
+        t.stop()
+        job = t.current_job
+        if job:
+            app.logger.info(f'Requesting termination of job {job.get_id()} ...')
+            job.request_stop()
+        try:
+            job_queue.put_nowait(WorkerThreadInterrupter())
+        except queue.Full:
+            pass
+
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+        if t.is_alive():
+            app.logger.warning(f'Queue worker thread {t.name} did not terminate within {timeout} seconds')
 
 
 def detect_proxy_settings(envvars) -> None:
@@ -205,10 +317,9 @@ def detect_proxy_settings(envvars) -> None:
         'all_proxy',
         'ALL_PROXY'
     ]:
-        if varname in envvars:
-            proxy_url_raw = envvars[varname]
-
-            match = re.search(r"^(?P<protocol>.+?)://((?P<username>.+?):(?P<password>.+?)@)?(?P<address>.+)$", proxy_url_raw)
+        proxy_url_raw = envvars.get(varname)
+        if proxy_url_raw is not None:
+            match = proxy_url_regex.match(proxy_url_raw)
             if not match:
                 app.logger.warning(f'Found proxy server info in ${varname}, but could not parse it as a proxy server URL "{proxy_url_raw}". Skipping ...')
                 continue
@@ -232,8 +343,9 @@ def detect_proxy_settings(envvars) -> None:
 
     # Try to detect bypass domains
     for varname in ['no_proxy', 'NO_PROXY']:
-        if varname in envvars:
-            Config.PROXY_BYPASS_DOMAINS = envvars[varname]
+        bypass_domains = envvars.get(varname)
+        if bypass_domains is not None:
+            Config.PROXY_BYPASS_DOMAINS = bypass_domains
             app.logger.info(f'Detected proxy bypass domains in ${varname}: {Config.PROXY_BYPASS_DOMAINS}')
             app.logger.debug(f'Proxy bypass domains: {Config.PROXY_BYPASS_DOMAINS}')
             break
@@ -272,4 +384,8 @@ def run() -> None:
         detect_proxy_settings(os.environ)
 
     start_processing_thread()
-    waitress.serve(app, host=Config.SERVER_HOST, port=Config.SERVER_PORT)
+    waitress.serve(app, host=Config.SERVER_HOST, port=Config.SERVER_PORT, threads=Config.SERVER_THREADS)
+
+    # Stop running jobs and release pooled connections to Moodle on shutdown
+    stop_processing_threads()
+    MoodleAPI.close_sessions()
@@ -23,13 +23,15 @@ import os
 import re
 import tarfile
 import threading
+from collections import deque
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from time import time
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from uuid import UUID
 
-import requests
 from PIL.Image import Resampling
 from playwright.async_api import async_playwright, ViewportSize, BrowserContext, Route
 from pypdf import PdfWriter
@@ -55,11 +57,7 @@ class QuizArchiveJob:
         self.workdir = None
         self.archived_attempts = {}
         self.logger = logging.getLogger(f"{__name__}::<{self.id}>")
-        self.moodle_api = MoodleAPI(
-            ws_rest_url=self.request.moodle_ws_url,
-            ws_upload_url=self.request.moodle_upload_url,
-            wstoken=self.request.wstoken
-        )
+        self._stop_event = threading.Event()
 
         # Limit number of attempts in demo mode
         if self.request.tasks['archive_quiz_attempts']:
@@ -68,6 +66,20 @@ class QuizArchiveJob:
                 if len(self.request.tasks['archive_quiz_attempts']['attemptids']) > 10:
                     self.request.tasks['archive_quiz_attempts']['attemptids'] = self.request.tasks['archive_quiz_attempts']['attemptids'][:10]
 
+    @cached_property
+    def moodle_api(self) -> MoodleAPI:
+        """
+        Moodle API adapter for this job. Created on first use, since queued
+        jobs do not need to talk to Moodle until they are processed.
+
+        :return: MoodleAPI instance
+        """
+        return MoodleAPI(
+            ws_rest_url=self.request.moodle_ws_url,
+            ws_upload_url=self.request.moodle_upload_url,
+            wstoken=self.request.wstoken
+        )
+
     def __eq__(self, other):
         if isinstance(other, self.__class__):
             return self.id == other.id
@@ -95,6 +107,23 @@ class QuizArchiveJob:
         """
         return self.id
 
+    def request_stop(self) -> None:
+        """
+        Requests this job to terminate gracefully. The job checks for this
+        request at defined points during its execution.
+
+        :return: None
+        """
+        self._stop_event.set()
+
+    def stop_requested(self) -> bool:
+        """
+        Returns whether this job was requested to terminate
+
+        :return: True if termination of this job was requested
+        """
+        return self._stop_event.is_set()
+
     def get_status(self) -> JobStatus:
         """
         Returns the current status of this job
@@ -114,7 +143,9 @@ class QuizArchiveJob:
     def set_status(self, status: JobStatus, statusextras: Dict = None, notify_moodle: bool = False) -> None:
         """
         Updates the status of this job. If notify_moodle is True, the status update
-        is passed to the Moodle API as well.
+        is passed to the Moodle API as well. Progress updates (status RUNNING)
+        are sent in the background while all other status changes are sent
+        synchronously.
 
         :param status: New job status
         :param statusextras: Additional status information
@@ -125,7 +156,10 @@ class QuizArchiveJob:
         self.statusextras = statusextras
 
         if notify_moodle:
-            self.moodle_api.update_job_status(jobid=self.id, status=self.status, statusextras=self.statusextras)
+            if self.status == JobStatus.RUNNING:
+                self.moodle_api.enqueue_job_status_update(jobid=self.id, status=self.status, statusextras=self.statusextras)
+            else:
+                self.moodle_api.update_job_status(jobid=self.id, status=self.status, statusextras=self.statusextras)
             self.last_moodle_status_update = time()
 
     def execute(self) -> None:
@@ -165,12 +199,10 @@ class QuizArchiveJob:
                 for archive_file in archive_files:
                     if os.path.isfile(archive_file):
                         with open(archive_file, 'rb') as f:
-                            if threading.current_thread().stop_requested():
+                            if self.stop_requested():
                                 raise InterruptedError('Thread stop requested')
 
-                            sha256_hash = hashlib.sha256()
-                            for byte_block in iter(lambda: f.read(4096), b""):
-                                sha256_hash.update(byte_block)
+                            sha256_hash = hashlib.file_digest(f, 'sha256')
                             with open(f'{f.name}.sha256', 'w+') as hashfile:
                                 hashfile.write(sha256_hash.hexdigest())
 
@@ -185,12 +217,10 @@ class QuizArchiveJob:
 
                     # Calculate checksum
                     with open(archive_file, 'rb') as f:
-                        if threading.current_thread().stop_requested():
+                        if self.stop_requested():
                             raise InterruptedError('Thread stop requested')
 
-                        archive_sha256sum = hashlib.sha256()
-                        for byte_block in iter(lambda: f.read(4096), b""):
-                            archive_sha256sum.update(byte_block)
+                        archive_sha256sum = hashlib.file_digest(f, 'sha256')
 
                     # Push final file to Moodle
                     self._push_artifact_to_moodle(archive_file, archive_sha256sum.hexdigest())
@@ -234,44 +264,66 @@ class QuizArchiveJob:
             context.set_default_navigation_timeout(Config.REPORT_WAIT_FOR_NAVIGATION_TIMEOUT_SEC * 1000)
             self.logger.debug("Spawned new playwright Browser and BrowserContext")
 
-            for attemptid in attemptids:
-                if threading.current_thread().stop_requested():
-                    raise InterruptedError('Thread stop requested')
-                else:
-                    # Process attempt
-                    await self._render_quiz_attempt(context, attemptid, paper_format)
-                    if self.request.tasks['archive_quiz_attempts']['image_optimize']:
-                        await self._compress_pdf(
-                            file=Path(f"{self.workdir}/attempts/{self.archived_attempts[attemptid]}/{self.archived_attempts[attemptid]}.pdf"),
-                            pdf_compression_level=6,
-                            image_maxwidth=self.request.tasks['archive_quiz_attempts']['image_optimize']['width'],
-                            image_maxheight=self.request.tasks['archive_quiz_attempts']['image_optimize']['height'],
-                            image_quality=self.request.tasks['archive_quiz_attempts']['image_optimize']['quality']
-                        )
-
-                    # Report status
-                    if time() >= self.last_moodle_status_update + Config.STATUS_REPORTING_INTERVAL_SEC:
-                        self.set_status(
-                            JobStatus.RUNNING,
-                            statusextras={'progress': round((len(self.archived_attempts) / len(attemptids)) * 100)},
-                            notify_moodle=True
-                        )
+            image_optimize = self.request.tasks['archive_quiz_attempts']['image_optimize']
+
+            # Attempt data is prefetched from Moodle while previous attempts are still being rendered
+            attemptids_remaining = iter(attemptids)
+            attempt_data_tasks = deque(
+                (attemptid, asyncio.create_task(self._fetch_attempt_data(attemptid)))
+                for attemptid in islice(attemptids_remaining, max(1, Config.MOODLE_API_MAX_PARALLEL_REQUESTS))
+            )
+
+            try:
+                while attempt_data_tasks:
+                    if self.stop_requested():
+                        raise InterruptedError('Thread stop requested')
                     else:
-                        self.logger.debug("Skipping status update because reporting interval has not been reached yet")
+                        # Wait for attempt data and keep the prefetch queue filled
+                        attemptid, attempt_data_task = attempt_data_tasks.popleft()
+                        attempt_name, attempt_html, attempt_attachments = await attempt_data_task
+                        for next_attemptid in islice(attemptids_remaining, 1):
+                            attempt_data_tasks.append((next_attemptid, asyncio.create_task(self._fetch_attempt_data(next_attemptid))))
+
+                        # Process attempt
+                        await self._render_quiz_attempt(context, attemptid, attempt_name, attempt_html, attempt_attachments, paper_format)
+                        if image_optimize:
+                            await self._compress_pdf(
+                                file=Path(f"{self.workdir}/attempts/{self.archived_attempts[attemptid]}/{self.archived_attempts[attemptid]}.pdf"),
+                                pdf_compression_level=6,
+                                image_maxwidth=image_optimize['width'],
+                                image_maxheight=image_optimize['height'],
+                                image_quality=image_optimize['quality']
+                            )
+
+                        # Report status
+                        if time() >= self.last_moodle_status_update + Config.STATUS_REPORTING_INTERVAL_SEC:
+                            self.set_status(
+                                JobStatus.RUNNING,
+                                statusextras={'progress': round((len(self.archived_attempts) / len(attemptids)) * 100)},
+                                notify_moodle=True
+                            )
+                        else:
+                            self.logger.debug("Skipping status update because reporting interval has not been reached yet")
+            finally:
+                # Discard prefetched attempt data that will not be processed anymore
+                for _, attempt_data_task in attempt_data_tasks:
+                    attempt_data_task.cancel()
+                await asyncio.gather(*(task for _, task in attempt_data_tasks), return_exceptions=True)
 
             await browser.close()
             self.logger.debug("Destroyed playwright Browser and BrowserContext")
 
-    async def _render_quiz_attempt(self, bctx: BrowserContext, attemptid: int, paper_format: str) -> None:
+    async def _fetch_attempt_data(self, attemptid: int) -> Tuple[str, str, List[Dict[str, str]]]:
         """
-        Renders a complete quiz attempt to a PDF file
+        Retrieves the attempt data (name, HTML DOM, attachment metadata) for a
+        quiz attempt from the Moodle API without blocking the event loop
 
-        :param attemptid: ID of the quiz attempt to render
-        :param paper_format: Paper format to use for the PDF (e.g. 'A4')
-        :return: None
+        :param attemptid: ID of the quiz attempt to fetch data for
+        :return: Tuple consisting of the attempt name, the HTML DOM report and
+                 a List of attachments for the requested attemptid
         """
-        # Retrieve attempt data
-        attempt_name, attempt_html, attempt_attachments = self.moodle_api.get_attempt_data(
+        return await asyncio.to_thread(
+            self.moodle_api.get_attempt_data,
             self.request.courseid,
             self.request.cmid,
             self.request.quizid,
@@ -281,6 +333,25 @@ class QuizArchiveJob:
             self.request.tasks['archive_quiz_attempts']['sections']['attachments']
         )
 
+    async def _render_quiz_attempt(
+            self,
+            bctx: BrowserContext,
+            attemptid: int,
+            attempt_name: str,
+            attempt_html: str,
+            attempt_attachments: List[Dict[str, str]],
+            paper_format: str
+    ) -> None:
+        """
+        Renders a complete quiz attempt to a PDF file
+
+        :param attemptid: ID of the quiz attempt to render
+        :param attempt_name: Name of the quiz attempt, as returned by the Moodle API
+        :param attempt_html: HTML DOM of the quiz attempt report
+        :param attempt_attachments: List of attachments of the quiz attempt
+        :param paper_format: Paper format to use for the PDF (e.g. 'A4')
+        :return: None
+        """
         # Prepare attempt dir
         attempt_dir = f"{self.workdir}/attempts/{attempt_name}"
         os.makedirs(attempt_dir, exist_ok=True)
@@ -570,7 +641,7 @@ class QuizArchiveJob:
         while True:
             status = self.moodle_api.get_backup_status(self.id, backupid)
 
-            if threading.current_thread().stop_requested():
+            if self.stop_requested():
                 raise InterruptedError('Thread stop requested')
 
             if status == BackupStatus.SUCCESS:
@@ -591,7 +662,7 @@ class QuizArchiveJob:
             # Try to get JSON content if debug logging is enabled to allow debugging
             if Config.LOG_LEVEL == logging.DEBUG:
                 if content_type.startswith('application/json'):
-                    r = requests.get(
+                    r = self.moodle_api.readonly_session.get(
                         url=download_url,
                         proxies=MoodleAPI.generate_proxy_settings(),
                         params={'token': self.request.wstoken},
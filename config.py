@@ -74,6 +74,9 @@ class Config:
     SERVER_PORT = parse_env_variable('QUIZ_ARCHIVER_SERVER_PORT', default='8080', valtype=int)
     """Port for Flask to listen on"""
 
+    SERVER_THREADS = parse_env_variable('QUIZ_ARCHIVER_SERVER_THREADS', default=8, valtype=int)
+    """Number of threads the web server uses to handle incoming requests"""
+
     PROXY_SERVER_URL = parse_env_variable('QUIZ_ARCHIVER_PROXY_SERVER_URL', default=None, valtype=str)
     """URL of the proxy server to use for all playwright requests. HTTP and SOCKS proxies are supported. If not set, auto-detection will be performed. If set to false, no proxy will be used."""
 
@@ -89,6 +92,9 @@ class Config:
     QUEUE_SIZE = parse_env_variable('QUIZ_ARCHIVER_QUEUE_SIZE', default=8, valtype=int)
     """Maximum number of requests that are queued before returning an error."""
 
+    WORKER_THREADS = parse_env_variable('QUIZ_ARCHIVER_WORKER_THREADS', default=1, valtype=int)
+    """Number of jobs that are processed in parallel. Every job runs its own headless browser, so memory usage grows accordingly."""
+
     HISTORY_SIZE = parse_env_variable('QUIZ_ARCHIVER_HISTORY_SIZE', default=128, valtype=int)
     """Maximum number of jobs to keep in the history before forgetting about them."""
 
@@ -98,6 +104,9 @@ class Config:
     REQUEST_TIMEOUT_SEC = parse_env_variable('QUIZ_ARCHIVER_REQUEST_TIMEOUT_SEC', default=(60 * 60), valtype=int)
     """Number of seconds before execution of a single request is aborted."""
 
+    MOODLE_API_MAX_PARALLEL_REQUESTS = parse_env_variable('QUIZ_ARCHIVER_MOODLE_API_MAX_PARALLEL_REQUESTS', default=4, valtype=int)
+    """Maximum number of requests to the Moodle API that are performed in parallel for a single job (e.g., prefetching of quiz attempt data)"""
+
     BACKUP_STATUS_RETRY_SEC = parse_env_variable('QUIZ_ARCHIVER_BACKUP_STATUS_RETRY_SEC', default=30, valtype=int)
     """Number of seconds between status checks of pending backups via the Moodle API"""
 
@@ -16,7 +16,6 @@
 import os
 import shutil
 import tempfile
-import threading
 import uuid
 from pathlib import Path
 from typing import Tuple, List, Dict, Union
@@ -25,8 +24,9 @@ from uuid import UUID
 
 import pytest
 
-from archiveworker.custom_types import JobStatus, BackupStatus, WorkerThreadInterrupter
-from archiveworker.moodle_quiz_archive_worker import app as original_app, job_queue, job_history, InterruptableThread
+from archiveworker.custom_types import JobStatus, BackupStatus
+from archiveworker.moodle_api import MoodleAPI
+from archiveworker.moodle_quiz_archive_worker import app as original_app, job_queue, job_history, job_index, stop_processing_threads
 from config import Config
 
 
@@ -38,22 +38,21 @@ def app():
     })
 
     # Kill all still existing threads
-    for t in threading.enumerate():
-        if isinstance(t, InterruptableThread):
-            print(f"Cleaning up thread: {t.name} ...", end='')
-            t.stop()
-            job_queue.put_nowait(WorkerThreadInterrupter())
-            t.join()
-            print(' OK.')
+    stop_processing_threads()
 
     # Ensure an empty queue and history on each run
     job_queue.queue.clear()
     job_history.clear()
+    job_index.clear()
+
+    # Do not reuse HTTP sessions of previous runs
+    MoodleAPI.close_sessions()
 
     # Enforce some config values for tests
     Config.UNIT_TESTS_RUNNING = True
     Config.REPORT_WAIT_FOR_READY_SIGNAL = False
     Config.REQUEST_TIMEOUT_SEC = 30
+    Config.WORKER_THREADS = 1
 
     yield app
 
@@ -106,6 +105,7 @@ class MoodleAPIMockBase:
         self.patchers = {
             'check_connection': patch(self.CLS_ROOT+'.check_connection', new=self.check_connection),
             'update_job_status': patch(self.CLS_ROOT+'.update_job_status', new=self.update_job_status),
+            'enqueue_job_status_update': patch(self.CLS_ROOT+'.enqueue_job_status_update', new=self.enqueue_job_status_update),
             'get_backup_status': patch(self.CLS_ROOT+'.get_backup_status', new=self.get_backup_status),
             'get_remote_file_metadata': patch(self.CLS_ROOT+'.get_remote_file_metadata', new=self.get_remote_file_metadata),
             'download_moodle_file': patch(self.CLS_ROOT+'.download_moodle_file', new=self.download_moodle_file),
@@ -172,6 +172,9 @@ class MoodleAPIMockBase:
     def update_job_status(self, jobid: UUID, status: JobStatus, statusextras: Dict) -> bool:
         return True
 
+    def enqueue_job_status_update(self, jobid: UUID, status: JobStatus, statusextras: Dict) -> None:
+        self.update_job_status(jobid, status, statusextras)
+
     def get_backup_status(self, jobid: UUID, backupid: str) -> BackupStatus:
         return BackupStatus.SUCCESS
 
@@ -14,8 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import queue
 import pytest
 
+from collections import deque
 from unittest.mock import patch
 from uuid import UUID
 
@@ -144,6 +147,24 @@ class TestBasicAPIWithMockedMoodleAPI:
         assert response.json['status'] == WorkerStatus.BUSY
         assert response.json['queue_len'] == Config.QUEUE_SIZE
 
+    def test_status_unbounded_queue(self, client):
+        """
+        Tests that the worker does not report as busy if the queue size is unbounded
+
+        :param client: Flask test client
+        :return: None
+        """
+        with patch.object(Config, 'QUEUE_SIZE', 0), \
+                patch('archiveworker.moodle_quiz_archive_worker.job_queue', queue.Queue(maxsize=0)):
+            for n in range(3):
+                response = client.post('/archive', json=fixtures.empty_job.ARCHIVE_API_REQUEST)
+                assert response.status_code == 200
+
+            response = client.get('/status')
+            assert response.status_code == 200
+            assert response.json['status'] == WorkerStatus.UNKNOWN
+            assert response.json['queue_len'] == 3
+
     def test_job_status(self, client):
         """
         Tests that the worker reports the status of a job
@@ -164,6 +185,21 @@ class TestBasicAPIWithMockedMoodleAPI:
             assert response.status_code == 200
             assert response.json['status'] == JobStatus.AWAITING_PROCESSING
 
+    def test_job_status_serialization(self, client):
+        """
+        Tests that job IDs and status enums are serialized as plain JSON strings
+
+        :param client: Flask test client
+        :return: None
+        """
+        jobid = client.post('/archive', json=fixtures.empty_job.ARCHIVE_API_REQUEST).json['jobid']
+        assert UUID(jobid)
+
+        response = client.get(f'/status/{jobid}')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        assert response.json == {'id': jobid, 'status': 'AWAITING_PROCESSING'}
+
     def test_job_status_not_found(self, client):
         """
         Tests that the worker reports 404 for an unknown job during status retrieval
@@ -175,6 +211,53 @@ class TestBasicAPIWithMockedMoodleAPI:
         assert response.status_code == 404
         assert 'not found' in response.json['error']
 
+    @pytest.mark.parametrize("jobid", [
+        'not-a-uuid',
+        '00000000-0000-0000-0000-00000000000',
+    ])
+    def test_job_status_invalid_jobid(self, client, jobid):
+        """
+        Tests that the worker reports 404 for a malformed jobid during status retrieval
+
+        :param client: Flask test client
+        :param jobid: Malformed jobid to request the status for
+        :return: None
+        """
+        response = client.get(f'/status/{jobid}')
+        assert response.status_code == 404
+        assert 'not found' in response.json['error']
+
+    def test_job_status_evicted_from_history(self, client):
+        """
+        Tests that jobs that were evicted from the job history are no longer found
+
+        :param client: Flask test client
+        :return: None
+        """
+        with patch('archiveworker.moodle_quiz_archive_worker.job_history', deque(maxlen=2)):
+            jobids = []
+            for n in range(3):
+                response = client.post('/archive', json=fixtures.empty_job.ARCHIVE_API_REQUEST)
+                assert response.status_code == 200
+                jobids.append(response.json['jobid'])
+
+            assert client.get(f'/status/{jobids[0]}').status_code == 404
+            for jobid in jobids[1:]:
+                assert client.get(f'/status/{jobid}').status_code == 200
+                assert client.get(f'/status/{jobid.upper()}').status_code == 200
+
+    def test_job_status_history_disabled(self, client):
+        """
+        Tests that no jobs are indexed if the job history is disabled
+
+        :param client: Flask test client
+        :return: None
+        """
+        with patch('archiveworker.moodle_quiz_archive_worker.job_history', deque(maxlen=0)):
+            response = client.post('/archive', json=fixtures.empty_job.ARCHIVE_API_REQUEST)
+            assert response.status_code == 200
+            assert client.get(f'/status/{response.json["jobid"]}').status_code == 404
+
     def test_queue_job(self, client):
         """
         Tests queueing a basic job
@@ -245,6 +328,91 @@ class TestBasicAPIWithMockedMoodleAPI:
         assert response.status_code == 400
         assert 'API version mismatch' in response.json['error']
 
+    @pytest.mark.parametrize('api_version, expected_error', [
+        (None, 'API version missing'),
+        ('6', 'API version must be an integer'),
+        (6.0, 'API version must be an integer'),
+    ])
+    def test_queue_job_malformed_api_version(self, client, api_version, expected_error):
+        """
+        Tests queueing a job with a missing or non-integer API version
+
+        :param client: Flask test client
+        :param api_version: API version to send, or None to omit it
+        :param expected_error: Expected error message
+        :return: None
+        """
+        job = fixtures.empty_job.ARCHIVE_API_REQUEST.copy()
+        job.pop('api_version')
+        if api_version is not None:
+            job['api_version'] = api_version
+
+        response = client.post('/archive', json=job)
+
+        assert response.status_code == 400
+        assert expected_error in response.json['error']
+
+    @pytest.mark.parametrize('archive_filename', [
+        '',
+        '../archive',
+        'archives/archive',
+        'archive.tar',
+        'C:\\archive',
+        'archive\0',
+    ])
+    def test_queue_job_invalid_archive_filename(self, client, archive_filename):
+        """
+        Tests queueing a job with an archive filename that is empty, a path, or
+        contains forbidden characters
+
+        :param client: Flask test client
+        :param archive_filename: Archive filename to use
+        :return: None
+        """
+        job = fixtures.empty_job.ARCHIVE_API_REQUEST.copy()
+        job['archive_filename'] = archive_filename
+
+        response = client.post('/archive', json=job)
+
+        assert response.status_code == 400
+        assert 'Validation of request payload failed' in response.json['error']
+
+    @pytest.mark.parametrize('key, value', [
+        ('sections', True),
+        ('sections', ['attachments']),
+        ('image_optimize', True),
+        ('image_optimize', 'yes'),
+    ])
+    def test_queue_job_invalid_quiz_attempts_task(self, client, key, value):
+        """
+        Tests queueing a job with a quiz attempts task that contains values of
+        an invalid type
+
+        :param client: Flask test client
+        :param key: Key of the quiz attempts task to replace
+        :param value: Invalid value to use
+        :return: None
+        """
+        job = copy.deepcopy(fixtures.reference_quiz_single_attempt.ARCHIVE_API_REQUEST)
+        job['task_archive_quiz_attempts'][key] = value
+
+        response = client.post('/archive', json=job)
+
+        assert response.status_code == 400
+        assert 'Validation of request payload failed' in response.json['error']
+
+    def test_queue_job_malformed_json(self, client):
+        """
+        Tests queueing a job with a request body that is not valid JSON
+
+        :param client: Flask test client
+        :return: None
+        """
+        response = client.post('/archive', data='{"api_version": 6,', content_type='application/json')
+
+        assert response.status_code == 400
+        assert 'JSON data is invalid' in response.json['error']
+
     @pytest.mark.parametrize('key', [
         'moodle_base_url',
         'moodle_ws_url',
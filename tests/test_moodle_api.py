@@ -0,0 +1,601 @@
+# Moodle Quiz Archive Worker
+# Copyright (C) 2025 Niels Gandraß <niels@gandrass.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import io
+import os
+import threading
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+import orjson
+import pytest
+import requests
+
+from archiveworker.custom_types import BackupStatus, JobStatus
+from archiveworker.moodle_api import MoodleAPI
+from config import Config
+
+
+def build_response(content: bytes, status_code: int = 200, headers: dict = None) -> requests.Response:
+    """
+    Builds a requests.Response object with the given content
+
+    :param content: Raw response body
+    :param status_code: HTTP status code
+    :param headers: Additional response headers
+    :return: Response object
+    """
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = content
+    r.headers.update(headers or {})
+    return r
+
+
+def build_attempt_data(**overrides) -> dict:
+    """
+    Builds a valid response of the attempt data webservice function
+
+    :param overrides: Values to replace within the default response
+    :return: Attempt data response
+    """
+    return {
+        'attemptid': 42,
+        'courseid': 1,
+        'cmid': 2,
+        'quizid': 3,
+        'filename': 'attempt-42-student_2025-01-01-12-00-00',
+        'report': '<html><body><p>Attempt 42</p></body></html>',
+        'attachments': [],
+    } | overrides
+
+
+class TestMoodleAPI:
+    """
+    Tests for the Moodle API adapter
+    """
+
+    @pytest.fixture()
+    def moodle_api(self) -> MoodleAPI:
+        yield MoodleAPI(
+            ws_rest_url='http://localhost/webservice/rest/server.php',
+            ws_upload_url='http://localhost/webservice/upload.php',
+            wstoken='5ebe2294ecd0e0f08eab7690d2a6ee69'
+        )
+
+        # Shared sessions are class-level state and must not leak into other tests
+        MoodleAPI.close_sessions()
+
+    @staticmethod
+    def get_attempt_data(moodle_api: MoodleAPI, response: requests.Response):
+        """
+        Calls get_attempt_data with the given response returned by Moodle
+
+        :param moodle_api: MoodleAPI instance
+        :param response: Mocked response of the Moodle webservice API
+        :return: Result of get_attempt_data
+        """
+        with patch('requests.Session.request', return_value=response):
+            return moodle_api.get_attempt_data(1, 2, 3, 42, {'header': 1}, 'attempt-${attemptid}', False)
+
+    def test_get_attempt_data(self, moodle_api) -> None:
+        """
+        Tests that valid attempt data is parsed correctly
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        data = build_attempt_data()
+        name, report, attachments = self.get_attempt_data(moodle_api, build_response(orjson.dumps(data)))
+
+        assert name == data['filename']
+        assert report == data['report']
+        assert attachments == []
+
+    @pytest.mark.parametrize("prefix, suffix", [
+        (b'', b''),
+        (b'<html><body>', b''),
+        (b'', b'</body></html>'),
+        (b'<html><body>', b'</body></html>'),
+    ])
+    def test_get_attempt_data_html_wrapper(self, moodle_api, prefix, suffix) -> None:
+        """
+        Tests that the HTML wrapper some Moodle versions put around the JSON
+        response is removed without touching the JSON payload itself
+
+        :param moodle_api: MoodleAPI instance
+        :param prefix: Prefix to add in front of the JSON response
+        :param suffix: Suffix to add after the JSON response
+        :return: None
+        """
+        data = build_attempt_data(report='<html><body>Report</body></html>')
+        name, report, attachments = self.get_attempt_data(moodle_api, build_response(prefix + orjson.dumps(data) + suffix))
+
+        assert name == data['filename']
+        assert report == data['report']
+
+    def test_get_attempt_data_invalid_json(self, moodle_api) -> None:
+        """
+        Tests that responses that are not valid JSON are rejected
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        with pytest.raises(ValueError, match='returned invalid JSON'):
+            self.get_attempt_data(moodle_api, build_response(b'<html><body>Fatal error</body></html>'))
+
+    @pytest.mark.parametrize("missing_key", sorted(MoodleAPI.ATTEMPT_DATA_REQUIRED_FIELDS))
+    def test_get_attempt_data_incomplete(self, moodle_api, missing_key) -> None:
+        """
+        Tests that responses with missing keys are rejected
+
+        :param moodle_api: MoodleAPI instance
+        :param missing_key: Key to remove from the response
+        :return: None
+        """
+        data = build_attempt_data()
+        del data[missing_key]
+        with pytest.raises(ValueError, match='incomplete response'):
+            self.get_attempt_data(moodle_api, build_response(orjson.dumps(data)))
+
+    def test_enqueue_job_status_update_coalescing(self, moodle_api) -> None:
+        """
+        Tests that queued status updates are coalesced while a previous update
+        is still in flight and that synchronous updates are sent after all
+        queued updates
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        sent = []
+        first_update_started = threading.Event()
+        release_first_update = threading.Event()
+
+        def send_job_status_update(jobid, status, statusextras=None):
+            if not sent:
+                first_update_started.set()
+                release_first_update.wait(timeout=5)
+            sent.append((status, statusextras))
+            return True
+
+        jobid = uuid4()
+        with patch.object(moodle_api, '_send_job_status_update', side_effect=send_job_status_update):
+            moodle_api.enqueue_job_status_update(jobid, JobStatus.RUNNING, {'progress': 10})
+            assert first_update_started.wait(timeout=5)
+
+            # Updates queued while the first one is in flight replace each other
+            moodle_api.enqueue_job_status_update(jobid, JobStatus.RUNNING, {'progress': 20})
+            moodle_api.enqueue_job_status_update(jobid, JobStatus.RUNNING, {'progress': 30})
+            release_first_update.set()
+
+            assert moodle_api.update_job_status(jobid, JobStatus.FINALIZING)
+
+        assert sent == [
+            (JobStatus.RUNNING, {'progress': 10}),
+            (JobStatus.RUNNING, {'progress': 30}),
+            (JobStatus.FINALIZING, None),
+        ]
+
+    def test_get_attempts_metadata_batching(self, moodle_api) -> None:
+        """
+        Tests that attempt metadata is requested in batches and merged into a
+        single result
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        attemptids = list(range(1, 2 * MoodleAPI.ATTEMPTS_METADATA_BATCH_SIZE + 42))
+        requested_batches = []
+
+        def request(method, url, **kwargs):
+            query = parse_qs(urlparse(url).query)
+            assert query['wstoken'] == [moodle_api.wstoken]
+            assert query['courseid'] == ['1']
+            batch = [int(attemptid) for attemptid in query['attemptids[]']]
+            requested_batches.append(batch)
+            return build_response(orjson.dumps({
+                'courseid': 1,
+                'cmid': 2,
+                'quizid': 3,
+                'attempts': [{'attemptid': attemptid} for attemptid in batch],
+            }))
+
+        with patch('requests.Session.request', side_effect=request):
+            metadata = moodle_api.get_attempts_metadata(1, 2, 3, attemptids)
+
+        # Batches are requested in parallel but the result must keep the attempt order
+        assert sorted(len(batch) for batch in requested_batches) == [41, MoodleAPI.ATTEMPTS_METADATA_BATCH_SIZE, MoodleAPI.ATTEMPTS_METADATA_BATCH_SIZE]
+        assert [attempt['attemptid'] for attempt in metadata] == attemptids
+
+    @pytest.mark.parametrize("ws_rest_url, ws_upload_url", [
+        ('', 'http://localhost/webservice/upload.php'),
+        ('ftp://localhost/webservice/rest/server.php', 'http://localhost/webservice/upload.php'),
+        ('http://localhost/webservice/rest/server.php?foo=bar', 'http://localhost/webservice/upload.php'),
+        ('http://localhost/webservice/rest/server.php', ''),
+        ('http://localhost/webservice/rest/server.php', 'http://localhost/webservice/rest/server.php'),
+        ('http://localhost/webservice/rest/server.php', 'localhost/webservice/upload.php'),
+    ])
+    def test_invalid_urls(self, ws_rest_url, ws_upload_url) -> None:
+        """
+        Tests that invalid webservice URLs are rejected
+
+        :param ws_rest_url: Webservice REST URL
+        :param ws_upload_url: Webservice upload URL
+        :return: None
+        """
+        with pytest.raises(ValueError, match='Webservice'):
+            MoodleAPI(ws_rest_url=ws_rest_url, ws_upload_url=ws_upload_url, wstoken='5ebe2294ecd0e0f08eab7690d2a6ee69')
+
+    @pytest.mark.parametrize("side_effect", [
+        requests.ConnectionError('Connection refused'),
+        [build_response(b'<html><body>Fatal error</body></html>')],
+    ])
+    def test_process_uploaded_artifact_connection_error(self, moodle_api, side_effect) -> None:
+        """
+        Tests that failing calls to the upload processing hook raise a
+        ConnectionError
+
+        :param moodle_api: MoodleAPI instance
+        :param side_effect: Exception to raise or response to return on request
+        :return: None
+        """
+        with patch('requests.Session.request', side_effect=side_effect):
+            with pytest.raises(ConnectionError, match='Failed to call upload processing hook'):
+                moodle_api.process_uploaded_artifact(uuid4(), 'mod_quiz', 1, 2, 'artifact', 'archive.tar.gz', '/', 0, 'sha256')
+
+    @pytest.mark.parametrize("status, expected", [
+        *[(status.value, status) for status in BackupStatus],
+        ('E_BACKUP_UNKNOWN', None),
+    ])
+    def test_get_backup_status(self, moodle_api, status, expected) -> None:
+        """
+        Tests that backup status values are mapped to BackupStatus members and
+        that unknown values are rejected
+
+        :param moodle_api: MoodleAPI instance
+        :param status: Status value returned by Moodle
+        :param expected: Expected BackupStatus or None if an error is expected
+        :return: None
+        """
+        response = build_response(orjson.dumps({'status': status}))
+
+        with patch('requests.Session.request', return_value=response):
+            if expected:
+                assert moodle_api.get_backup_status(uuid4(), 'backup-1') is expected
+            else:
+                with pytest.raises(RuntimeError, match='E_BACKUP_UNKNOWN'):
+                    moodle_api.get_backup_status(uuid4(), 'backup-1')
+
+    @pytest.mark.parametrize("sha1sum_valid", [True, False])
+    def test_download_moodle_file_sha1sum(self, moodle_api, tmp_path, sha1sum_valid) -> None:
+        """
+        Tests that the SHA1 sum of downloaded files is verified
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :param sha1sum_valid: Whether the expected SHA1 sum matches the file contents
+        :return: None
+        """
+        content = os.urandom(3 * MoodleAPI.DOWNLOAD_CHUNK_SIZE + 42)
+        sha1sum = hashlib.sha1(content).hexdigest() if sha1sum_valid else hashlib.sha1(b'').hexdigest()
+        response = build_response(b'')
+        response.raw = io.BytesIO(content)
+
+        with patch('requests.Session.request', return_value=response):
+            if sha1sum_valid:
+                assert moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz', sha1sum) == len(content)
+                assert tmp_path.joinpath('backup.mbz').read_bytes() == content
+            else:
+                with pytest.raises(RuntimeError, match='Expected SHA1 sum'):
+                    moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz', sha1sum)
+
+    def test_session_connection_pool(self, moodle_api) -> None:
+        """
+        Tests that the HTTP session is able to keep a connection alive for
+        every concurrent request to Moodle
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        for prefix in ['http://', 'https://']:
+            for session in [moodle_api.session, moodle_api.readonly_session]:
+                adapter = session.get_adapter(f'{prefix}localhost')
+                assert adapter._pool_maxsize > Config.MOODLE_API_MAX_PARALLEL_REQUESTS
+                assert adapter.max_retries.connect == 1
+
+    def test_session_connection_pool_worker_threads(self, moodle_api) -> None:
+        """
+        Tests that the HTTP session is able to keep a connection alive for
+        every concurrent request of all jobs that are processed in parallel
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        MoodleAPI.close_sessions()
+        with patch.object(Config, 'WORKER_THREADS', 8):
+            new_moodle_api = MoodleAPI(moodle_api.ws_rest_url, moodle_api.ws_upload_url, moodle_api.wstoken)
+
+        adapter = new_moodle_api.session.get_adapter('https://localhost')
+        assert adapter._pool_maxsize >= 8 * Config.MOODLE_API_MAX_PARALLEL_REQUESTS
+
+    def test_session_retries(self, moodle_api) -> None:
+        """
+        Tests that only the read-only session retries requests that possibly
+        already reached Moodle, since state-changing webservice functions are
+        invoked via GET as well
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        retry = moodle_api.session.get_adapter('https://localhost').max_retries
+        assert retry.read == 0
+        assert retry.status == 0
+        assert not retry.is_retry('GET', 504)
+
+        readonly_retry = moodle_api.readonly_session.get_adapter('https://localhost').max_retries
+        assert readonly_retry.total == MoodleAPI.HTTP_RETRIES
+        assert readonly_retry.is_retry('GET', 504)
+
+    def test_download_moodle_file_content_length_exceeded(self, moodle_api, tmp_path) -> None:
+        """
+        Tests that downloads are aborted before reading the body if the
+        announced Content-Length exceeds the maximum file size
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :return: None
+        """
+        response = build_response(b'', headers={'Content-Length': '2048'})
+        response.raw = io.BytesIO(os.urandom(2048))
+
+        with patch('requests.Session.request', return_value=response):
+            with pytest.raises(RuntimeError, match='exceeds the maximum file size limit'):
+                moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz', maxsize_bytes=1024)
+
+        assert response.raw.closed
+
+    def test_download_moodle_file_size_exceeded(self, moodle_api, tmp_path) -> None:
+        """
+        Tests that downloads without a Content-Length header are aborted before
+        more than the maximum file size is written to disk
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :return: None
+        """
+        maxsize_bytes = MoodleAPI.DOWNLOAD_CHUNK_SIZE + 42
+        response = build_response(b'')
+        response.raw = io.BytesIO(os.urandom(2 * MoodleAPI.DOWNLOAD_CHUNK_SIZE))
+
+        with patch('requests.Session.request', return_value=response):
+            with pytest.raises(RuntimeError, match='exceeded the maximum file size limit'):
+                moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz', maxsize_bytes=maxsize_bytes)
+
+        assert tmp_path.joinpath('backup.mbz').stat().st_size <= maxsize_bytes
+        assert response.raw.closed
+
+    def test_download_moodle_file_error_response(self, moodle_api, tmp_path) -> None:
+        """
+        Tests that Moodle error responses are detected when downloading a file
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :return: None
+        """
+        response = build_response(b'')
+        response.raw = io.BytesIO(orjson.dumps({'errorcode': 'invalidtoken', 'debuginfo': 'Invalid token'}))
+
+        with patch('requests.Session.request', return_value=response):
+            with pytest.raises(RuntimeError, match='invalidtoken'):
+                moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz')
+
+    def test_upload_file(self, moodle_api, tmp_path) -> None:
+        """
+        Tests that files are uploaded as a streamed multipart body
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to create the file to upload in
+        :return: None
+        """
+        file = tmp_path.joinpath('archive.tar.gz')
+        file.write_bytes(os.urandom(4096))
+        upload_metadata = {
+            'component': 'user',
+            'contextid': 1,
+            'userid': 2,
+            'filearea': 'draft',
+            'filename': file.name,
+            'filepath': '/',
+            'itemid': 42,
+        }
+        requests_sent = []
+
+        def request(method, url, data=None, headers=None, **kwargs):
+            requests_sent.append((headers['Content-Type'], data.read()))
+            return build_response(orjson.dumps([upload_metadata]))
+
+        with patch('requests.Session.request', side_effect=request):
+            assert moodle_api.upload_file(file) == upload_metadata
+
+        content_type, body = requests_sent[0]
+        assert content_type.startswith('multipart/form-data; boundary=')
+        assert f'name="token"\r\n\r\n{moodle_api.wstoken}'.encode() in body
+        assert f'name="file_1"; filename="{file.name}"'.encode() in body
+        assert file.read_bytes() in body
+
+    @pytest.mark.parametrize("content_length_offset", [0, 1024])
+    def test_download_moodle_file_preallocation(self, moodle_api, tmp_path, content_length_offset) -> None:
+        """
+        Tests that downloaded files have exactly the size of the received
+        content, even if the announced Content-Length was too large
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :param content_length_offset: Number of bytes the Content-Length header exceeds the content
+        :return: None
+        """
+        content = os.urandom(MoodleAPI.DOWNLOAD_CHUNK_SIZE + 42)
+        response = build_response(b'', headers={'Content-Length': str(len(content) + content_length_offset)})
+        response.raw = io.BytesIO(content)
+
+        with patch('requests.Session.request', return_value=response):
+            assert moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz') == len(content)
+
+        assert tmp_path.joinpath('backup.mbz').read_bytes() == content
+
+    def test_download_moodle_file_connection_error(self, moodle_api, tmp_path) -> None:
+        """
+        Tests that network errors during a download raise a ConnectionError
+
+        :param moodle_api: MoodleAPI instance
+        :param tmp_path: Temporary directory to download the file into
+        :return: None
+        """
+        with patch('requests.Session.request', side_effect=requests.ConnectionError('Connection refused')):
+            with pytest.raises(ConnectionError, match='Failed to download Moodle file'):
+                moodle_api.download_moodle_file('http://localhost/pluginfile.php/1/backup.mbz', tmp_path, 'backup.mbz')
+
+    def test_session_shared_per_host(self, moodle_api) -> None:
+        """
+        Tests that adapters for the same Moodle host share a single HTTP
+        session, regardless of the used wstoken
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        same_host = MoodleAPI(moodle_api.ws_rest_url, moodle_api.ws_upload_url, moodle_api.wstoken)
+        other_host = MoodleAPI(
+            ws_rest_url='http://moodle.localhost/webservice/rest/server.php',
+            ws_upload_url='http://moodle.localhost/webservice/upload.php',
+            wstoken=moodle_api.wstoken
+        )
+        other_token = MoodleAPI(moodle_api.ws_rest_url, moodle_api.ws_upload_url, 'a1b2c3d4e5f60718293a4b5c6d7e8f90')
+
+        assert same_host.session is moodle_api.session
+        assert other_host.session is not moodle_api.session
+        assert other_token.session is moodle_api.session
+
+    @staticmethod
+    def create_moodle_apis_for_other_hosts(count: int, wstoken: str) -> None:
+        """
+        Creates adapters for the given number of distinct Moodle hosts and
+        discards them right away
+
+        :param count: Number of hosts to create adapters for
+        :param wstoken: Web Service token to use
+        :return: None
+        """
+        for i in range(count):
+            MoodleAPI(
+                ws_rest_url=f'http://moodle{i}.localhost/webservice/rest/server.php',
+                ws_upload_url=f'http://moodle{i}.localhost/webservice/upload.php',
+                wstoken=wstoken
+            )
+
+    def test_session_cache_evicts_least_recently_used(self, moodle_api) -> None:
+        """
+        Tests that the number of cached HTTP sessions is bounded and that
+        evicted sessions are closed
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        idle_moodle_api = MoodleAPI(
+            ws_rest_url='http://idle.localhost/webservice/rest/server.php',
+            ws_upload_url='http://idle.localhost/webservice/upload.php',
+            wstoken=moodle_api.wstoken
+        )
+        idle_session = idle_moodle_api.session
+        del idle_moodle_api
+
+        with patch.object(idle_session, 'close') as close:
+            self.create_moodle_apis_for_other_hosts(MoodleAPI.HTTP_SESSIONS_MAX, moodle_api.wstoken)
+            close.assert_called_once()
+
+        assert len(MoodleAPI._sessions) == MoodleAPI.HTTP_SESSIONS_MAX
+
+    def test_session_cache_keeps_sessions_in_use(self, moodle_api) -> None:
+        """
+        Tests that sessions that are still used by an adapter are never evicted
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        with patch.object(moodle_api.session, 'close') as close:
+            self.create_moodle_apis_for_other_hosts(2 * MoodleAPI.HTTP_SESSIONS_MAX, moodle_api.wstoken)
+            close.assert_not_called()
+
+        assert len(MoodleAPI._sessions) == MoodleAPI.HTTP_SESSIONS_MAX
+        new_moodle_api = MoodleAPI(moodle_api.ws_rest_url, moodle_api.ws_upload_url, moodle_api.wstoken)
+        assert new_moodle_api.session is moodle_api.session
+
+    def test_update_job_status_statusextras(self, moodle_api) -> None:
+        """
+        Tests that statusextras are sent JSON encoded when updating the job status
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        sent_params = []
+
+        def request(method, url, params=None, **kwargs):
+            sent_params.append(params)
+            return build_response(orjson.dumps({'status': 'OK'}))
+
+        jobid = uuid4()
+        with patch('requests.Session.request', side_effect=request):
+            assert moodle_api.update_job_status(jobid, JobStatus.RUNNING, {'progress': 42})
+            assert moodle_api.update_job_status(jobid, JobStatus.FINISHED)
+
+        assert sent_params[0]['jobid'] == str(jobid)
+        assert sent_params[0]['status'] == 'RUNNING'
+        assert orjson.loads(sent_params[0]['statusextras']) == {'progress': 42}
+        assert 'statusextras' not in sent_params[1]
+
+    def test_close_sessions(self, moodle_api) -> None:
+        """
+        Tests that closing the shared sessions makes new adapters use a new session
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        with patch.object(moodle_api.session, 'close') as close, \
+                patch.object(moodle_api.readonly_session, 'close') as readonly_close:
+            MoodleAPI.close_sessions()
+            close.assert_called_once()
+            readonly_close.assert_called_once()
+
+        new_moodle_api = MoodleAPI(moodle_api.ws_rest_url, moodle_api.ws_upload_url, moodle_api.wstoken)
+        assert new_moodle_api.session is not moodle_api.session
+
+    def test_get_attempts_metadata_batch_error(self, moodle_api) -> None:
+        """
+        Tests that an error in any metadata batch is propagated
+
+        :param moodle_api: MoodleAPI instance
+        :return: None
+        """
+        def request(method, url, **kwargs):
+            query = parse_qs(urlparse(url).query)
+            if '1' in query['attemptids[]']:
+                return build_response(orjson.dumps({'errorcode': 'invalidrecord', 'debuginfo': 'Attempt not found'}))
+            return build_response(orjson.dumps({'courseid': 1, 'cmid': 2, 'quizid': 3, 'attempts': []}))
+
+        with patch('requests.Session.request', side_effect=request):
+            with pytest.raises(RuntimeError, match='invalidrecord'):
+                moodle_api.get_attempts_metadata(1, 2, 3, list(range(1, 3 * MoodleAPI.ATTEMPTS_METADATA_BATCH_SIZE)))
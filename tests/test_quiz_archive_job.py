@@ -19,12 +19,13 @@ import logging
 import os
 import tarfile
 import tempfile
+import threading
 import time
 
 import pytest
 
 from archiveworker.custom_types import JobStatus
-from archiveworker.moodle_quiz_archive_worker import start_processing_thread
+from archiveworker.moodle_quiz_archive_worker import start_processing_thread, stop_processing_threads, job_queue
 from config import Config
 from .conftest import client, TestUtils
 import tests.fixtures as fixtures
@@ -73,6 +74,38 @@ class TestQuizArchiveJob:
                     if r.json['status'] not in (JobStatus.RUNNING, JobStatus.AWAITING_PROCESSING):
                         assert False, f"Unexpected status: {r.json['status']}"
 
+    @pytest.mark.timeout(5)
+    def test_parallel_job_processing(self, client) -> None:
+        """
+        Tests processing of "empty" jobs by multiple queue worker threads
+
+        :param client: Flask test client
+        :return: None
+        """
+        Config.WORKER_THREADS = 2
+
+        with fixtures.empty_job.MoodleAPIMock():
+            jobs = []
+            for i in range(4):
+                r = client.post('/archive', json=fixtures.empty_job.ARCHIVE_API_REQUEST)
+                assert r.status_code == 200
+                jobs.append(r.json['jobid'])
+
+            # Start processing threads
+            start_processing_thread()
+            assert len([t for t in threading.enumerate() if t.name.startswith('queue_processing_thread')]) == 2
+
+            # Wait for all jobs to be processed
+            while jobs:
+                time.sleep(0.2)
+                for jobid in jobs:
+                    r = client.get(f'/status/{jobid}')
+                    if r.json['status'] == JobStatus.FINISHED:
+                        jobs.remove(jobid)
+                        continue
+                    if r.json['status'] not in (JobStatus.RUNNING, JobStatus.AWAITING_PROCESSING):
+                        assert False, f"Unexpected status: {r.json['status']}"
+
     @pytest.mark.timeout(5)
     def test_job_timeout(self, client) -> None:
         """
@@ -101,6 +134,37 @@ class TestQuizArchiveJob:
                 if r.json['status'] == JobStatus.FINISHED:
                     assert False, 'Job should have timed out'
 
+    @pytest.mark.timeout(5)
+    def test_stop_processing_threads_stops_running_job(self, client) -> None:
+        """
+        Tests that stopping the queue workers requests termination of the jobs
+        that are currently executed instead of waiting for them to finish.
+
+        :param client: Flask test client
+        :return: None
+        """
+        started = threading.Event()
+        stop = threading.Event()
+
+        class BlockingJob:
+            def execute(self):
+                started.set()
+                stop.wait()
+
+            def get_id(self):
+                return 'blocking-job'
+
+            def request_stop(self):
+                stop.set()
+
+        start_processing_thread()
+        job_queue.put(BlockingJob())
+        assert started.wait(timeout=2)
+
+        stop_processing_threads()
+        assert stop.is_set()
+        assert not [t for t in threading.enumerate() if t.name.startswith('queue_processing_thread')]
+
     @pytest.mark.timeout(30)
     def test_archive_full_quiz(self, client) -> None:
         """